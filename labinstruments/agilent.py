@@ -12,7 +12,16 @@ Agilent SCPI instructions:
 
 """
 
-from labinstruments.generic import GenericInstrument
+import math
+from functools import lru_cache
+
+from labinstruments.generic import AsyncGenericInstrument, GenericInstrument
+
+_VOLT_UNITS = {'mv': 1e-3, 'uv': 1e-6, 'v': 1}
+_FREQ_UNITS = {'ghz': 1e9, 'mhz': 1e6, 'khz': 1e3, 'hz': 1}
+
+# Power units that can be calculated from a reading in dBm
+_POWER_UNITS_FROM_DBM = ('dbm', 'dbuv', 'dbuvemf', 'v', 'vemf')
 
 
 class Agilent34411A(GenericInstrument):
@@ -31,6 +40,9 @@ class Agilent34411A(GenericInstrument):
 
     """
 
+    # Pre-encoded commands
+    _CMD_MEAS_VOLT_DC = b'MEAS:VOLT:DC?'
+
     def measure_dc_voltage(self, units="V"):
         """Measure DC voltage.
 
@@ -42,9 +54,98 @@ class Agilent34411A(GenericInstrument):
 
         """
 
-        msg = 'MEAS:VOLT:DC?'
+        msg = self._CMD_MEAS_VOLT_DC
         return float(self._query(msg)) / _voltage_units(units)
 
+    def fetch(self, npoints, units="V", timeout=None):
+        """Take several readings and return them all at once.
+
+        Readings are taken with the present measurement configuration (e.g.,
+        DC voltage after ``measure_dc_voltage``).
+
+        Args:
+            npoints (int): number of readings
+            units (str): units for voltage readings
+            timeout (float, optional): timeout in seconds for the acquisition,
+                default is the instrument timeout
+
+        Returns:
+            numpy.ndarray: readings
+
+        """
+
+        import numpy as np
+
+        msg = f'SAMP:COUN {npoints:d};:INIT;:FETC?'
+        with self._temporary_timeout(timeout or self._timeout):
+            self._send(msg)
+            resp = self._receive_line()
+
+        # Parse all values at once (straight from the received bytes) and
+        # scale the whole array
+        return np.fromstring(resp, sep=',') / _voltage_units(units)
+
+    def arm(self, npoints, source="EXT"):
+        """Arm the multimeter to take one reading per trigger.
+
+        Use ``fetch_readings`` to collect the readings.
+
+        Args:
+            npoints (int): number of triggers (readings) to wait for
+            source (str): trigger source, default is "EXT" (rear panel
+                trigger input)
+
+        """
+
+        self._send_batch(f'TRIG:SOUR {source}', f'TRIG:COUN {npoints:d}',
+                         'SAMP:COUN 1', 'INIT')
+
+    def fetch_readings(self, units="V", timeout=None):
+        """Wait for the acquisition to finish and return all readings.
+
+        Args:
+            units (str): units for voltage readings
+            timeout (float, optional): timeout in seconds, default is the
+                instrument timeout
+
+        Returns:
+            numpy.ndarray: readings
+
+        """
+
+        import numpy as np
+
+        with self._temporary_timeout(timeout or self._timeout):
+            self._send(b'FETC?')
+            resp = self._receive_line()
+        return np.fromstring(resp, sep=',') / _voltage_units(units)
+
+    def fetch_array(self, npoints):
+        """Read and remove readings from the multimeter's reading memory.
+
+        The readings are transferred in binary (64-bit float) format, which
+        is much faster than parsing ASCII values for large numbers of
+        readings. The readings must already be in memory (e.g., after
+        ``INIT``).
+
+        Args:
+            npoints (int): number of readings
+
+        Returns:
+            numpy.ndarray: readings
+
+        """
+
+        import numpy as np
+
+        # Big-endian byte order (FORM:BORD NORM)
+        self._send_batch('FORM:DATA REAL,64', 'FORM:BORD NORM',
+                         f'DATA:REM? {npoints:d}')
+        data = self._receive_block()
+        self._send(b'FORM:DATA ASC')
+
+        return np.frombuffer(data, dtype='>f8').astype(np.float64)
+
 
 class AgilentE8257D(GenericInstrument):
     """Class to control an Agilent signal generator.
@@ -60,6 +161,37 @@ class AgilentE8257D(GenericInstrument):
 
     """
 
+    # Pre-encoded commands
+    _CMD_FREQ_Q = b':FREQ?'
+    _CMD_POW_Q = b':POW?'
+    _CMD_OUTP_ON = b':OUTP ON'
+    _CMD_OUTP_OFF = b':OUTP OFF'
+    _CMD_OUTP_Q = b'OUTP:STAT?'
+    _CMD_UNIT_POW_DBM = b':UNIT:POW DBM'
+
+    # Command templates (values are sent as str() would print them, so that
+    # no resolution is lost)
+    _FMT_FREQ = b':FREQ %s%s'
+    _FMT_POW = b':POW %s%s'
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        # Power units used by the instrument (unknown until they are set)
+        self._pow_units = None
+
+    def reset(self):
+        """Reset instrument."""
+
+        super().reset()
+        self._pow_units = 'dbm'
+
+    def _invalidate_cache(self):
+        """Forget the power units used by the instrument."""
+
+        self._pow_units = None
+
     def set_frequency(self, value, units="GHz"):
         """Set CW frequency in given units.
 
@@ -69,7 +201,7 @@ class AgilentE8257D(GenericInstrument):
 
         """
 
-        msg = ':FREQ {}{}'.format(value, units)
+        msg = self._FMT_FREQ % _encode(value, units)
         self._send(msg)
 
     def get_frequency(self, units="GHz"):
@@ -83,7 +215,7 @@ class AgilentE8257D(GenericInstrument):
 
         """
 
-        msg = ':FREQ?'
+        msg = self._CMD_FREQ_Q
         return float(self._query(msg)) / _frequency_units(units)
 
     def set_power(self, value, units="dBm"):
@@ -95,12 +227,15 @@ class AgilentE8257D(GenericInstrument):
 
         """
 
-        msg = ":POW {}{}".format(value, units)
+        msg = self._FMT_POW % _encode(value, units)
         self._send(msg)
 
     def get_power(self, units="dBm"):
         """Get CW output power in given units.
 
+        Power in dBuV, dBuV EMF, V or V EMF is calculated from the power in
+        dBm (assuming a 50 ohm load).
+
         Args:
             units (str): power units, default is "dBm"
 
@@ -109,15 +244,25 @@ class AgilentE8257D(GenericInstrument):
 
         """
 
-        # Set power output units
+        units = units.lower()
+        local = units in _POWER_UNITS_FROM_DBM
+
+        # Set power output units (only if they have changed)
         # :UNIT:POWer DBM|DBUV|DBUVEMF|V|VEMF|DB
-        msg = ":UNIT:POW {}".format(units)
-        self._send(msg)
+        if local and self._pow_units != 'dbm':
+            self._send(self._CMD_UNIT_POW_DBM)
+            self._pow_units = 'dbm'
+        elif not local and self._pow_units != units:
+            msg = ":UNIT:POW {}".format(units.upper())
+            self._send(msg)
+            self._pow_units = units
 
         # Get power
         # [:SOURce]:POWer[:LEVel][:IMMediate][:AMPLitude]?
-        msg = ":POW?"
-        return float(self._query(msg))
+        msg = self._CMD_POW_Q
+        power = float(self._query(msg))
+
+        return _power_from_dbm(power, units) if local else power
 
     def rf_power(self, state="off"):
         """Toggle RF power on or off.
@@ -136,13 +281,13 @@ class AgilentE8257D(GenericInstrument):
     def power_on(self):
         """Turn RF power on."""
 
-        msg = ":OUTP ON"
+        msg = self._CMD_OUTP_ON
         self._send(msg)
 
     def power_off(self):
         """Turn RF power off."""
 
-        msg = ":OUTP OFF"
+        msg = self._CMD_OUTP_OFF
         self._send(msg)
 
     def get_output_state(self):
@@ -153,27 +298,85 @@ class AgilentE8257D(GenericInstrument):
 
         """
 
-        return int(self._query('OUTP:STAT?'))
+        return self._query_int(self._CMD_OUTP_Q)
+
+    def configure(self, freq=None, power=None, output=None, freq_units="GHz",
+                  power_units="dBm"):
+        """Set frequency, power and/or output state in a single write.
+
+        Args:
+            freq (float, optional): CW frequency
+            power (float, optional): power level
+            output (bool, optional): turn RF power on (True) or off (False)
+            freq_units (str): frequency units, default is "GHz"
+            power_units (str): power units, default is "dBm"
+
+        """
+
+        cmds = []
+        if freq is not None:
+            cmds.append(self._FMT_FREQ % _encode(freq, freq_units))
+        if power is not None:
+            cmds.append(self._FMT_POW % _encode(power, power_units))
+        if output is not None:
+            cmds.append(self._CMD_OUTP_ON if output else self._CMD_OUTP_OFF)
+        if cmds:
+            self._send_batch(*cmds)
+
+
+class AsyncAgilent34411A(AsyncGenericInstrument):
+    """Class to read data from an Agilent multimeter using asyncio.
+
+    Mirrors the ``Agilent34411A`` API, but every method is a coroutine. Use
+    ``connect`` to create an instance::
+
+        dmm = await AsyncAgilent34411A.connect("192.168.0.3")
+        voltage = await dmm.measure_dc_voltage('mV')
+
+    """
+
+    async def measure_dc_voltage(self, units="V"):
+        """Measure DC voltage.
+
+        Args:
+            units (str): units for voltage measurement
+
+        Returns:
+            float: DC voltage
+
+        """
+
+        msg = Agilent34411A._CMD_MEAS_VOLT_DC
+        return float(await self._query(msg)) / _voltage_units(units)
+
 
 # Helper functions -----------------------------------------------------------
 
+@lru_cache(maxsize=8)
 def _voltage_units(units):
     """Get voltage multiplier."""
-    voltage_units = {'mv': 1e-3, 'uv': 1e-6, 'v': 1}
-    try:
-        return voltage_units[units.lower()]
-    except KeyError as e:
-        print('Error: Voltage units must be one of V, mV, or uV')
-        raise e
+    return _VOLT_UNITS[units.lower()]
 
+@lru_cache(maxsize=8)
 def _frequency_units(units):
     """Get frequency multiplier."""
-    frequency_units = {'ghz': 1e9, 'mhz': 1e6, 'khz': 1e3, 'hz': 1}
-    try:
-        return frequency_units[units.lower()]
-    except KeyError as e:
-        print('Error: Frequency units must be one of GHz, MHz, kHz, or Hz')
-        raise e
+    return _FREQ_UNITS[units.lower()]
+
+def _encode(value, units):
+    """Encode a value and its units for a command template."""
+    return str(value).encode('ASCII'), units.encode('ASCII')
+
+def _power_from_dbm(power_dbm, units):
+    """Convert power from dBm to dBm, dBuV, dBuV EMF, V or V EMF (50 ohm)."""
+    if units == 'dbm':
+        return power_dbm
+    # RMS voltage across 50 ohm load (EMF is twice the voltage)
+    voltage = math.sqrt(50 * 1e-3 * 10 ** (power_dbm / 10))
+    if units.endswith('emf'):
+        voltage *= 2
+    if units.startswith('dbuv'):
+        return 20 * math.log10(voltage / 1e-6)
+    return voltage
 
 
 # Main -----------------------------------------------------------------------
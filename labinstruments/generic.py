@@ -5,12 +5,33 @@ Can be used on their own or inherited.
 """
 
 
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import select
+import selectors
 import socket
-import telnetlib
+import sys
+import threading
 import time
 
-import pyvisa as visa
-import vxi11
+try:
+    import vxi11
+except ImportError:  # only needed for GenericInstrumentVX11
+    vxi11 = None
+
+# SO_BUSY_POLL is Linux-only and is not defined by the socket module
+_SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL',
+                        46 if sys.platform.startswith('linux') else None)
+
+# Idle connections to instruments, keyed by (ip_address, port)
+_POOL = {}
+_POOL_LOCK = threading.Lock()
+
+
+class InstrumentTimeout(TimeoutError):
+    """The instrument did not respond in time."""
 
 
 class GenericInstrument:
@@ -21,91 +42,335 @@ class GenericInstrument:
             ``ip_address='192.168.0.3'``
         port (int, optional, default is 5025): the port set for Ethernet
             communication
+        timeout (float, optional, default is 2): socket timeout in seconds,
+            or None to block indefinitely. After a timeout, the connection
+            is reopened before the next command is sent, so that a late
+            response can't be mistaken for the next one.
+        verbose (bool): verbosity
+        retries (int, optional, default is 2): number of times to retry
+            connecting (with exponential backoff) before giving up
+        rcvbuf (int, optional, default is 256 kB): size of the kernel receive
+            buffer (SO_RCVBUF), larger values help with large transfers
+        sndbuf (int, optional, default is 64 kB): size of the kernel send
+            buffer (SO_SNDBUF)
+        low_latency (bool, optional, default is False): busy poll the
+            socket while waiting for a response (Linux only, SO_BUSY_POLL).
+            This reduces the latency of each query at the cost of CPU time,
+            e.g., when polling a marker value in a tight loop.
+
+    Raises:
+        ConnectionError: if the connection to the instrument fails
+
+    Note:
+
+        ``close`` returns the connection to a process-wide pool, so creating
+        another instance for the same instrument later on reuses it instead
+        of opening a new connection. Use ``destroy`` to close the connection
+        for good.
 
     """
 
-    def __init__(self, ip_address, port=5025, timeout=None, verbose=False):
+    # Pre-encoded commands
+    _CMD_IDN = b'*IDN?'
+    _CMD_RST = b'*RST'
 
-        # Create socket
-        try:
-            self._inst = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            if timeout:
-                self._inst.settimeout(timeout)
-        except socket.error as e:
-            print('Error creating socket: %s' % e)
-            sys.exit(1)
+    # Maximum number of bytes to read from the socket at once
+    _RECV_SIZE = 65536
+
+    # Identity strings of the instruments that have been connected to, keyed
+    # by (ip_address, port)
+    _id_cache = {}
+
+    # Commands collected within a ``batch`` block (None if not batching)
+    _pending = None
+
+    # True after a timeout, since the late response may still arrive
+    _stale = False
+
+    def __init__(self, ip_address, port=5025, timeout=2.0, verbose=False,
+                 retries=2, rcvbuf=262144, sndbuf=65536, low_latency=False):
 
         # Connect to instrument
-        try:
-            self._inst.connect((ip_address, port))
-        except socket.gaierror as e:
-            print('Address-related error connecting to instrument: %s' % e)
-            sys.exit(1)
-        except socket.error as e:
-            print('Error connecting to socket on instrument: %s' % e)
-            sys.exit(1)
+        self._address = (ip_address, port)
+        self._timeout = timeout
+        self._socket_options = dict(timeout=timeout, retries=retries,
+                                    rcvbuf=rcvbuf, sndbuf=sndbuf,
+                                    busy_poll=50 if low_latency else 0)
+        self._inst = _acquire_socket(ip_address, port, **self._socket_options)
 
-        # Get information about instrument
-        self._id_str = self.get_id()
+        # Data received from the instrument that has not been read yet
+        self._rxbuf = bytearray()
+
+        # Preallocated buffer that the socket reads into
+        self._rxmem = bytearray(self._RECV_SIZE)
+        self._rxview = memoryview(self._rxmem)
+
+        # Last command sent (for error messages)
+        self._last_cmd = b''
+
+        # Get information about instrument (only queried on first connection)
         self.verbose = verbose
-        if self.verbose:
-            print(f"Instrument: {self._id_str}")
+        self._id_str = self._id_cache.get(self._address)
+        if self._id_str is None:
+            self.get_id()
+            if self.verbose:
+                print(f"Instrument: {self._id_str}")
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+    def __del__(self):
+
+        # Release the connection if the instrument was never closed
+        if getattr(self, '_inst', None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
 
     def close(self):
-        """Close connection to instrument."""
+        """Close connection to instrument.
 
-        self._inst.close()
+        The connection is returned to the pool so that it can be reused.
 
-    def get_id(self):
-        """Get instrument identity information."""
+        """
+
+        if self._inst is not None:
+            clean = not self._rxbuf and not self._stale
+            _release_socket(self._address, self._inst, clean=clean)
+            self._inst = None
+
+    def destroy(self):
+        """Close connection to instrument without returning it to the pool."""
+
+        if self._inst is not None:
+            self._inst.close()
+            self._inst = None
+
+    def fileno(self):
+        """Get the file descriptor of the connection (e.g., for select)."""
+
+        return self._inst.fileno()
 
-        self._send('*IDN?')
-        return self._receive().replace(',', ' ').strip()
+    def get_id(self, force=False):
+        """Get instrument identity information.
+
+        The identity does not change, so it is only queried the first time
+        the instrument is connected to.
+
+        Args:
+            force (bool, optional, default is False): query the instrument,
+                instead of returning the identity that was cached when
+                connecting
+
+        Returns:
+            string: instrument identity
+
+        """
+
+        if force or self._id_str is None:
+            self._send(self._CMD_IDN)
+            self._id_str = self._receive().replace(',', ' ').strip()
+            self._id_cache[self._address] = self._id_str
+        return self._id_str
 
     def reset(self):
         """Reset instrument."""
 
-        self._send("*RST")
+        self._send(self._CMD_RST)
     
     def _send(self, msg):
         """Send command to instrument.
 
         Args:
-            msg (string): command to send
+            msg (string or bytes): command to send
 
         """
 
-        msg = msg + '\n'
-        self._inst.send(msg.encode('ASCII'))
+        if self._pending is not None:
+            if isinstance(msg, bytes):
+                msg = msg.decode('ASCII')
+            self._pending.append(msg)
+            if '?' not in msg:
+                return
+            # Queries can't wait: send them with the commands collected so far
+            msg = _compound_message(self._pending)
+            self._pending.clear()
+
+        if isinstance(msg, str):
+            msg = msg.encode('ASCII')
+        if self._stale:
+            # The response to an earlier query may still arrive: start over
+            # with a new connection so it isn't taken as the next response
+            self._reconnect()
+        self._last_cmd = msg
+        try:
+            self._inst.sendall(msg + b'\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # Connection was dropped (e.g., instrument was power cycled):
+            # reconnect once and try again
+            self._reconnect()
+            self._inst.sendall(msg + b'\n')
+
+    def _send_batch(self, *msgs):
+        """Send several commands to the instrument in a single write.
+
+        The commands are joined into one SCPI compound message.
+
+        Args:
+            msgs (string): commands to send
+
+        """
+
+        self._send(_compound_message(msgs))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Collect the commands sent within a with block and send them all
+        in a single write (SCPI compound message) at the end of the block.
+
+        Example::
+
+            with speca.batch():
+                speca.set_center_frequency(7, 'ghz')
+                speca.set_span(10, 'mhz')
+                speca.set_sweep_points(401)
+
+        Queries are sent immediately, together with any commands collected
+        before them. If an exception is raised within the block, the
+        collected commands are not sent, and any settings cached by the
+        instrument class are discarded (see ``_invalidate_cache``).
+
+        """
+
+        if self._pending is not None:
+            # Already batching
+            yield
+            return
+
+        self._pending = []
+        try:
+            yield
+            pending = self._pending
+        except BaseException:
+            # The cached settings may include commands that were never sent
+            self._invalidate_cache()
+            raise
+        finally:
+            self._pending = None
+        if pending:
+            self._send_batch(*pending)
+
+    def _invalidate_cache(self):
+        """Discard settings cached from the commands that have been sent.
+
+        Called when the commands collected by ``batch`` are discarded and
+        when reconnecting (the instrument may have been power cycled).
+        Override this in instrument classes that cache their settings.
+
+        """
+
+        pass
+
+    @contextlib.contextmanager
+    def _temporary_timeout(self, timeout):
+        """Use a different socket timeout within a with block.
+
+        Args:
+            timeout (float): socket timeout in seconds, or None to block
+                indefinitely
+
+        """
+
+        self._inst.settimeout(timeout)
+        try:
+            yield
+        finally:
+            self._inst.settimeout(self._timeout)
+
+    def _reconnect(self):
+        """Replace the connection to the instrument with a new one.
+
+        The new connection keeps the current socket timeout, which may have
+        been changed by ``_temporary_timeout``.
+
+        """
+
+        options = dict(self._socket_options, timeout=self._inst.gettimeout())
+        self._inst.close()
+        self._inst = _open_scpi_socket(*self._address, **options)
+        self._rxbuf.clear()
+        self._stale = False
+
+        # Settings may have been lost (e.g., instrument was power cycled)
+        self._invalidate_cache()
 
     def _receive(self):
         """Receive message from instrument.
 
+        Reads until a complete (newline-terminated) message has been
+        received, so this also works for long or fragmented responses.
+
+        Raises:
+            InstrumentTimeout: if no response is received within the timeout
+
         Returns:
             string: output from instrument
 
         """
 
-        msg = self._inst.recv(1024).decode('ASCII')
-        return msg.strip()
+        return self._receive_line().decode('ASCII').strip()
+
+    def _receive_line(self):
+        """Receive one newline-terminated message without decoding it.
 
-    def _receive_all(self):
-        """Receive large messages from the instrument.
+        Raises:
+            InstrumentTimeout: if no response is received within the timeout
 
         Returns:
-            string: output from instrument
+            bytes: message (without the newline)
 
         """
 
-        BUFF_SIZE = 1024
-        data = b''
-        while True:
-            time.sleep(0.01)
-            part = self._inst.recv(1024)
-            data += part
-            if len(part) < 1024:
+        # Only search the new data for the newline each time
+        end = self._rxbuf.find(b'\n')
+        while end < 0:
+            start = len(self._rxbuf)
+            if not self._recv_chunk():
+                end = len(self._rxbuf)
                 break
-        return data.decode('ASCII')
+            end = self._rxbuf.find(b'\n', start)
+
+        line = bytes(self._rxbuf[:end])
+        del self._rxbuf[:end + 1]
+        return line
+
+    def _recv_chunk(self):
+        """Read the data that is available into the receive buffer.
+
+        Blocks until at least some data has been received.
+
+        Raises:
+            InstrumentTimeout: if no data is received within the timeout
+
+        Returns:
+            bool: False if the instrument closed the connection
+
+        """
+
+        try:
+            nbytes = self._inst.recv_into(self._rxview)
+        except socket.timeout as e:
+            self._stale = True
+            raise InstrumentTimeout(
+                f"No response to {self._last_cmd.decode('ASCII')!r}") from e
+        self._rxbuf += self._rxview[:nbytes]
+        return nbytes > 0
 
     def _query(self, msg):
         """Send message and then receive message from the instrument
@@ -118,6 +383,97 @@ class GenericInstrument:
         self._send(msg)
         return self._receive()
 
+    def _query_int(self, msg):
+        """Send message and then receive an integer from the instrument.
+
+        The response is parsed without decoding it to a string first.
+
+        Returns:
+            int: output from instrument
+
+        """
+
+        self._send(msg)
+        return int(self._receive_line())
+
+    def _query_bytes(self, msg):
+        """Send message and then receive binary data from the instrument.
+
+        The response must be an IEEE 488.2 definite-length block, e.g., as
+        returned by most instruments after ``FORM:DATA REAL``.
+
+        Returns:
+            bytes: data block (without header)
+
+        """
+
+        self._send(msg)
+        return self._receive_block()
+
+    def _receive_block(self):
+        """Receive an IEEE 488.2 definite-length block from the instrument.
+
+        The block has the form ``#<N><length><data>``, where ``<N>`` is the
+        number of digits in ``<length>``. Exactly ``<length>`` bytes are
+        read, so no delimiter has to be searched for in the binary data.
+
+        Returns:
+            bytearray: data block (without header)
+
+        """
+
+        self._receive_at_least(2)
+        self._receive_at_least(2 + _block_header_digits(self._rxbuf))
+        start, length = _parse_block_header(self._rxbuf)
+        del self._rxbuf[:start]
+        data = self._recv_exact(length)
+
+        # Terminating newline
+        self._receive_at_least(1)
+        self._rxbuf = self._rxbuf.lstrip(b'\r\n')
+        return data
+
+    def _recv_exact(self, nbytes):
+        """Receive exactly nbytes bytes from the instrument.
+
+        Data that is already in the receive buffer is used first. The rest
+        is read directly into a preallocated buffer, so large blocks are
+        not copied each time more data arrives.
+
+        Raises:
+            InstrumentTimeout: if no data is received within the timeout
+            ConnectionError: if the instrument closed the connection
+
+        Returns:
+            bytearray: received data
+
+        """
+
+        data = bytearray(nbytes)
+        view = memoryview(data)
+        nread = min(len(self._rxbuf), nbytes)
+        view[:nread] = self._rxbuf[:nread]
+        del self._rxbuf[:nread]
+
+        while nread < nbytes:
+            try:
+                n = self._inst.recv_into(view[nread:], nbytes - nread)
+            except socket.timeout as e:
+                self._stale = True
+                raise InstrumentTimeout(
+                    f"No response to {self._last_cmd.decode('ASCII')!r}") from e
+            if not n:
+                raise ConnectionError("Connection closed by instrument")
+            nread += n
+        return data
+
+    def _receive_at_least(self, nbytes):
+        """Receive until the receive buffer holds at least nbytes bytes."""
+
+        while len(self._rxbuf) < nbytes:
+            if not self._recv_chunk():
+                raise ConnectionError("Connection closed by instrument")
+
     
 class GenericInstrumentVX11(GenericInstrument):
     """Control an instrument over LAN using SCPI commands using the VXI-11
@@ -126,46 +482,701 @@ class GenericInstrumentVX11(GenericInstrument):
     Args:
         ip_address (string): IP address of the instrument, e.g.,
             ``ip_address='192.168.0.3'``
+        verbose (bool): verbosity
 
     """
 
-    def __init__(self, ip_address):
+    def __init__(self, ip_address, verbose=False):
+
+        if vxi11 is None:
+            raise ImportError("GenericInstrumentVX11 requires the vxi11 "
+                              "package (see README)")
 
         # Connect to instrument
+        self._address = (ip_address, None)
         self._inst = vxi11.Instrument(ip_address)
 
         # Get information about instrument
-        self._id_str.get_id()
+        self.verbose = verbose
+        self._id_str = None
+        self.get_id()
+        if self.verbose:
+            print(f"Instrument: {self._id_str}")
+
+    def close(self):
+        """Close connection to instrument."""
+
+        if self._inst is not None:
+            self._inst.close()
+            self._inst = None
+
+    def destroy(self):
+        """Close connection to instrument."""
+
+        self.close()
+
+    def _send(self, msg):
+        """Send command to instrument.
+
+        VXI-11 messages are framed by the protocol, so no terminator is
+        added.
+
+        Args:
+            msg (string or bytes): command to send
+
+        """
+
+        if isinstance(msg, str):
+            msg = msg.encode('ASCII')
+        self._inst.write_raw(msg)
+
+    def _receive(self):
+        """Receive message from instrument.
+
+        Returns:
+            string: output from instrument
+
+        """
+
+        return self._inst.read().strip()
+
+    def _receive_line(self):
+        """Receive message from instrument without decoding it.
+
+        Returns:
+            bytes: output from instrument
+
+        """
+
+        return self._inst.read_raw().rstrip(b'\r\n')
+
+    def _query_bytes(self, msg):
+        """Send message and then receive binary data from the instrument.
+
+        The response must be an IEEE 488.2 definite-length block. The whole
+        response is transferred in one VXI-11 read.
+
+        Returns:
+            bytes: data block (without header)
+
+        """
+
+        self._send(msg)
+        data = self._inst.read_raw()
+        start, length = _parse_block_header(data)
+        return data[start:start + length]
 
 
 class GenericInstrumentTelnet:
-    """Control an instrument using Telnet.
+    """Control an instrument over a Telnet connection.
+
+    Commands are sent as lines of text and each response ends with a ``>``
+    prompt. The instrument also sends a prompt after each write; these are
+    counted and read before the response to the next query. Telnet option
+    negotiation is not needed by these instruments, so a plain TCP socket
+    is used instead of ``telnetlib`` (removed in Python 3.13); any Telnet
+    commands sent by the instrument are discarded.
 
     Args:
         ip_address (string): IP address of the instrument, e.g.,
             ``ip_address='192.168.0.159'``
+        port (int, optional, default is 23): Telnet port
+        timeout (float, optional, default is 3): timeout for each read in
+            seconds
 
     """
 
-    def __init__(self, ip_address):
+    _RECV_SIZE = 1024
+
+    def __init__(self, ip_address, port=23, timeout=3.0):
+
+        self._address = (ip_address, port)
+        self._timeout = timeout
+        self._sock = _open_scpi_socket(ip_address, port, timeout=timeout)
+        self._rxbuf = b''
+        self._rxmem = bytearray(self._RECV_SIZE)
+        self._last_cmd = ''
+
+        # Number of prompts from writes that have not been read yet
+        self._prompts = 0
+
+        # True after a timeout, since the late response may still arrive
+        self._stale = False
 
-        self._tn = telnetlib.Telnet(host=ip_address, port=23, timeout=3)
-    
     def _write(self, msg):
-        """Write via Telnet."""
+        """Write via Telnet.
+
+        The prompt that the instrument sends after the command is not
+        waited for. It is read before the response to the next query.
 
-        msg = msg + "\r\n"
-        self._tn.write(msg.encode('ASCII'))
+        """
+
+        self._send_lines([msg])
+        self._prompts += 1
 
     def _query(self, msg):
         """Query via Telnet."""
 
-        msg = msg + "\r\n"
-        self._tn.write(msg.encode('ASCII'))
-        results = self._tn.read_some().decode("utf-8")
-        return results.replace('>', '').strip()
+        return self._query_many([msg])[0]
+
+    def _query_many(self, msgs):
+        """Send several queries in one write and read all of the responses.
+
+        Each response ends with a ``>`` prompt.
+
+        Args:
+            msgs (list): queries
+
+        Returns:
+            list: one response (str) per query
+
+        """
+
+        self._send_lines(msgs)
+
+        # Skip the prompts sent after previous writes
+        while self._prompts:
+            self._read_prompt()
+            self._prompts -= 1
+
+        return [self._read_prompt().decode("utf-8").strip() for _ in msgs]
+
+    def _send_lines(self, msgs):
+        """Send one or more commands (one per line) in a single write."""
+
+        if self._stale:
+            # Responses to earlier commands may still arrive: start over
+            # with a new connection so they aren't taken as the next ones
+            self._reconnect()
+        self._last_cmd = msgs[-1]
+        self._sendall("".join(m + "\r\n" for m in msgs).encode('ASCII'))
+
+    def _sendall(self, data):
+        """Send data, reconnecting once if the connection was dropped."""
+
+        try:
+            self._sock.sendall(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self._reconnect()
+            self._sock.sendall(data)
+
+    def _reconnect(self):
+        """Replace the connection to the instrument with a new one."""
+
+        self._sock.close()
+        self._sock = _open_scpi_socket(*self._address, timeout=self._timeout)
+        self._rxbuf = b''
+        self._prompts = 0
+        self._stale = False
+
+        # Discard start up messages
+        self._drain(0.5)
+
+    def _read_prompt(self):
+        """Read until the next ``>`` prompt.
+
+        Raises:
+            InstrumentTimeout: if no prompt is received within the timeout
+
+        Returns:
+            bytes: data received before the prompt
+
+        """
+
+        while b'>' not in self._rxbuf:
+            try:
+                nbytes = self._sock.recv_into(self._rxmem)
+            except socket.timeout as e:
+                self._stale = True
+                raise InstrumentTimeout(
+                    f"No response to {self._last_cmd!r}") from e
+            if not nbytes:
+                raise ConnectionError("Instrument closed the connection")
+            self._rxbuf += _strip_telnet_commands(self._rxmem[:nbytes])
+        data, _, self._rxbuf = self._rxbuf.partition(b'>')
+        return data
+
+    def _drain(self, timeout):
+        """Wait up to ``timeout`` seconds for a prompt, then discard all of
+        the data that has been received (e.g., start up messages)."""
+
+        self._sock.settimeout(timeout)
+        try:
+            self._read_prompt()
+        except InstrumentTimeout:
+            pass
+        finally:
+            self._sock.settimeout(self._timeout)
+        self._rxbuf = b''
+        self._stale = False
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+    def __del__(self):
+
+        # Release the connection if the instrument was never closed
+        if getattr(self, '_sock', None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
 
     def close(self):
         """Close connection."""
 
-        self._tn.close()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class AsyncGenericInstrument:
+    """Control an instrument over LAN using SCPI commands with asyncio.
+
+    This allows several instruments to be controlled concurrently from a
+    single thread, e.g., using ``asyncio.gather``. Use ``connect`` to create
+    an instance::
+
+        dmm = await AsyncGenericInstrument.connect('192.168.0.3')
+
+    Note:
+
+        Only instruments that communicate over a raw socket are supported.
+        VXI-11/VISA instruments can be called from a thread using
+        ``loop.run_in_executor``.
+
+    """
+
+    # True after a timeout, since the late response may still arrive
+    _stale = False
+
+    @classmethod
+    async def connect(cls, ip_address, port=5025, timeout=2.0, verbose=False,
+                      rcvbuf=262144, sndbuf=65536):
+        """Connect to instrument.
+
+        Args:
+            ip_address (string): IP address of the instrument, e.g.,
+                ``ip_address='192.168.0.3'``
+            port (int, optional, default is 5025): the port set for Ethernet
+                communication
+            timeout (float, optional, default is 2): timeout for each read in
+                seconds, or None to wait indefinitely
+            verbose (bool): verbosity
+            rcvbuf (int, optional, default is 256 kB): size of the kernel
+                receive buffer (SO_RCVBUF)
+            sndbuf (int, optional, default is 64 kB): size of the kernel send
+                buffer (SO_SNDBUF)
+
+        Returns:
+            instrument instance
+
+        """
+
+        self = cls()
+        self._address = (ip_address, port)
+        self._timeout = timeout
+        self._buffer_sizes = (rcvbuf, sndbuf)
+        self.verbose = verbose
+
+        await self._open()
+
+        # Only one query at a time, so that responses can't be swapped
+        self._lock = asyncio.Lock()
+
+        # Get information about instrument
+        self._id_str = await self.get_id()
+        if self.verbose:
+            print(f"Instrument: {self._id_str}")
+
+        return self
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, *exc):
+
+        await self.close()
+
+    async def close(self):
+        """Close connection to instrument."""
+
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _open(self):
+        """Open the connection to the instrument."""
+
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(*self._address), self._timeout)
+        sock = self._writer.get_extra_info('socket')
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        rcvbuf, sndbuf = self._buffer_sizes
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+
+    async def _reconnect(self):
+        """Replace the connection to the instrument with a new one."""
+
+        self._stale = False
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+        await self._open()
+
+    async def get_id(self):
+        """Get instrument identity information."""
+
+        msg = await self._query(GenericInstrument._CMD_IDN)
+        return msg.replace(',', ' ').strip()
+
+    async def reset(self):
+        """Reset instrument."""
+
+        await self._send(GenericInstrument._CMD_RST)
+
+    async def _send(self, msg):
+        """Send command to instrument.
+
+        Args:
+            msg (string or bytes): command to send
+
+        """
+
+        if isinstance(msg, str):
+            msg = msg.encode('ASCII')
+        if self._stale:
+            # The response to an earlier query may still arrive: start over
+            # with a new connection so it isn't taken as the next response
+            await self._reconnect()
+        self._writer.write(msg + b'\n')
+        await self._writer.drain()
+
+    async def _send_batch(self, *msgs):
+        """Send several commands to the instrument in a single write.
+
+        Args:
+            msgs (string): commands to send
+
+        """
+
+        await self._send(_compound_message(msgs))
+
+    async def _receive(self):
+        """Receive message from instrument.
+
+        Raises:
+            InstrumentTimeout: if no response is received within the timeout
+
+        Returns:
+            string: output from instrument
+
+        """
+
+        try:
+            msg = await asyncio.wait_for(self._reader.readuntil(b'\n'),
+                                         self._timeout)
+        except asyncio.TimeoutError as e:
+            self._stale = True
+            raise InstrumentTimeout("No response from instrument") from e
+        return msg.decode('ASCII').strip()
+
+    async def _query(self, msg):
+        """Send message and then receive message from the instrument
+
+        Queries from concurrent coroutines (e.g., ``asyncio.gather``) are
+        sent one at a time.
+
+        Returns:
+            string: output from instrument
+
+        """
+
+        async with self._lock:
+            await self._send(msg)
+            return await self._receive()
+
+
+# Functions ------------------------------------------------------------------
+
+def multi_query(queries):
+    """Query several instruments at once from a single thread.
+
+    All of the commands are sent first and then the responses are read as
+    they arrive, so the round trips to the different instruments overlap.
+
+    Example::
+
+        freq, voltage = multi_query([(sg, 'FREQ?'), (dmm, 'MEAS:VOLT:DC?')])
+
+    Args:
+        queries (list): list of (instrument, command) tuples, where each
+            instrument is a ``GenericInstrument``
+
+    Raises:
+        InstrumentTimeout: if an instrument does not respond in time
+
+    Returns:
+        list: responses (strings), in the same order as ``queries``
+
+    """
+
+    # Send all commands and count the responses expected from each instrument
+    expected = {}
+    for inst, cmd in queries:
+        inst._send(cmd)
+        expected[inst] = expected.get(inst, 0) + 1
+
+    # Timeout is set by the slowest instrument
+    timeouts = [inst._timeout for inst in expected]
+    timeout = None if None in timeouts else max(timeouts)
+
+    # Read until every instrument has sent all of its responses
+    with selectors.DefaultSelector() as sel:
+        for inst, n in expected.items():
+            if inst._rxbuf.count(b'\n') < n:
+                sel.register(inst, selectors.EVENT_READ)
+        while sel.get_map():
+            events = sel.select(timeout)
+            if not events:
+                for key in sel.get_map().values():
+                    key.fileobj._stale = True
+                raise InstrumentTimeout("No response from " + ", ".join(
+                    key.fileobj._id_str for key in sel.get_map().values()))
+            for key, _ in events:
+                inst = key.fileobj
+                closed = not inst._recv_chunk()
+                if closed or inst._rxbuf.count(b'\n') >= expected[inst]:
+                    sel.unregister(inst)
+
+    return [inst._receive() for inst, _ in queries]
+
+
+def parallel(calls):
+    """Call methods of several instruments at the same time.
+
+    Each call runs in its own thread, so the round trips to the different
+    instruments overlap and the total time is set by the slowest
+    instrument. This works with any instrument class (socket, VXI-11,
+    VISA or Telnet).
+
+    Example::
+
+        parallel([(sg.set_frequency, 5, 'GHz'),
+                  (yig.set_frequency, 5, 'GHz'),
+                  (ps.set_voltage, 3)])
+
+    Note:
+
+        Instruments are not thread-safe, so each instrument should only
+        appear once in ``calls``.
+
+    Args:
+        calls (list): list of (function, arg1, arg2, ...) tuples (use
+            ``functools.partial`` to pass keyword arguments)
+
+    Returns:
+        list: return values, in the same order as ``calls``
+
+    """
+
+    if not calls:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(len(calls)) as ex:
+        futures = [ex.submit(fn, *args) for fn, *args in calls]
+        return [f.result() for f in futures]
+
+
+# Helper functions -----------------------------------------------------------
+
+def _compound_message(msgs):
+    """Join commands into a single SCPI compound message.
+
+    Each command is prefixed with a colon (unless it is a common command,
+    e.g., ``*OPC?``) so that it is interpreted from the root of the command
+    tree. Commands can be strings or (pre-encoded) bytes.
+
+    """
+
+    msgs = [m.encode('ASCII') if isinstance(m, str) else m for m in msgs]
+    return b';'.join(m if m[:1] in (b':', b'*') else b':' + m for m in msgs)
+
+def _block_header_digits(data):
+    """Get number of length digits in an IEEE 488.2 block header."""
+
+    if data[:1] != b'#' or not data[1:2].isdigit() or data[1:2] == b'0':
+        raise ValueError(f"Expected a definite-length block, received "
+                         f"{bytes(data[:20])!r}")
+    return int(data[1:2])
+
+def _parse_block_header(data):
+    """Parse IEEE 488.2 block header.
+
+    Args:
+        data (bytes): data starting with the block header
+
+    Returns:
+        tuple: start index and length of the data block
+
+    """
+
+    ndigits = _block_header_digits(data)
+    return 2 + ndigits, int(data[2:2 + ndigits])
+
+def _strip_telnet_commands(data):
+    """Remove Telnet commands (IAC sequences) from received data."""
+    data = bytes(data)
+    if b'\xff' not in data:
+        return data
+    out, i = bytearray(), 0
+    while i < len(data):
+        if data[i] != 0xff:
+            out.append(data[i])
+            i += 1
+        elif i + 1 < len(data) and data[i + 1] == 0xff:
+            # Escaped 0xff data byte
+            out.append(0xff)
+            i += 2
+        elif i + 1 < len(data) and 251 <= data[i + 1] <= 254:
+            # WILL/WONT/DO/DONT <option>
+            i += 3
+        else:
+            i += 2
+    return bytes(out)
+
+def _acquire_socket(ip_address, port, timeout=None, **kwargs):
+    """Get a connection to an instrument, reusing an idle one if possible.
+
+    Keyword arguments are passed to ``_open_scpi_socket``.
+
+    """
+
+    with _POOL_LOCK:
+        sock = _POOL.pop((ip_address, port), None)
+    if sock is not None:
+        if _is_reusable(sock):
+            sock.settimeout(timeout)
+            _set_busy_poll(sock, kwargs.get('busy_poll', 0))
+            return sock
+        sock.close()
+    return _open_scpi_socket(ip_address, port, timeout=timeout, **kwargs)
+
+def _release_socket(address, sock, clean=True):
+    """Return a connection to the pool (or close it if it can't be reused)."""
+
+    if clean and _is_reusable(sock):
+        with _POOL_LOCK:
+            if address not in _POOL:
+                _POOL[address] = sock
+                return
+    sock.close()
+
+@atexit.register
+def _close_pool():
+    """Close all idle connections (called when the interpreter exits)."""
+    with _POOL_LOCK:
+        socks = list(_POOL.values())
+        _POOL.clear()
+    for sock in socks:
+        sock.close()
+
+def _is_reusable(sock):
+    """Check that a connection is still open and has no unread data."""
+
+    try:
+        if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+            return False
+        # Readable means either unread data or the peer closed the connection
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+def _set_busy_poll(sock, usec):
+    """Set how long to busy poll for when reading (ignored if this isn't
+    supported or permitted)."""
+    if _SO_BUSY_POLL is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, _SO_BUSY_POLL, usec)
+    except OSError:
+        pass
+
+def _open_scpi_socket(ip_address, port, timeout=None, retries=0,
+                      nodelay=True, keepalive=True, rcvbuf=None, sndbuf=None,
+                      busy_poll=0):
+    """Create a TCP socket and connect it to an instrument.
+
+    Args:
+        ip_address (string): IP address of the instrument
+        port (int): the port set for Ethernet communication
+        timeout (float, optional): socket timeout in seconds, or None to
+            block indefinitely
+        retries (int): number of times to retry connecting, waiting 0.1 s,
+            0.2 s, 0.4 s, etc. between attempts
+        nodelay (bool): disable Nagle's algorithm (TCP_NODELAY), since SCPI
+            traffic is short command/response pairs
+        keepalive (bool): enable TCP keepalive (SO_KEEPALIVE)
+        rcvbuf (int, optional): size of the kernel receive buffer
+            (SO_RCVBUF), default is the system default
+        sndbuf (int, optional): size of the kernel send buffer (SO_SNDBUF),
+            default is the system default
+        busy_poll (int, optional): time in microseconds to busy poll for
+            when reading (SO_BUSY_POLL, Linux only), default is no busy
+            polling
+
+    Raises:
+        ConnectionError: if the socket cannot be created or connected
+
+    Returns:
+        socket.socket: connected socket
+
+    """
+
+    for attempt in range(retries + 1):
+
+        if attempt:
+            time.sleep(0.1 * 2 ** (attempt - 1))
+
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            raise ConnectionError(f"Error creating socket: {e}") from e
+
+        try:
+            if nodelay:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if keepalive:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Buffer sizes must be set before connecting to take full effect
+            if rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            if sndbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            if busy_poll:
+                _set_busy_poll(sock, busy_poll)
+            sock.settimeout(timeout)
+            sock.connect((ip_address, port))
+            return sock
+        except socket.gaierror as e:
+            # Bad address: no point retrying
+            sock.close()
+            raise ConnectionError(
+                f"Address-related error connecting to instrument: {e}") from e
+        except OSError as e:
+            sock.close()
+            error = e
+
+    raise ConnectionError(
+        f"Error connecting to socket on instrument: {error}") from error
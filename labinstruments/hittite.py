@@ -6,14 +6,12 @@ Hittite SCPI commands can be found here:
 
 """
 
-import os
-import socket
-import sys
-import time
+from functools import lru_cache
 
-from labinstruments.generic import GenericInstrument
+from labinstruments.generic import AsyncGenericInstrument, GenericInstrument
 
 FREQ_UNIT_GHZ = {'hz': 1e-9, 'khz': 1e-6, 'mhz': 1e-3, 'ghz': 1}
+_FREQ_UNITS = {'ghz': 1e9, 'mhz': 1e6, 'khz': 1e3, 'hz': 1}
 
 
 class Hittite(GenericInstrument):
@@ -31,16 +29,46 @@ class Hittite(GenericInstrument):
             communication on the Hittite signal generator
         verbose (bool): verbosity
 
+    Note:
+
+        The last frequency, power and output state that were set are cached,
+        and the ``get_*`` methods return the cached values instead of
+        querying the instrument. Use ``refresh=True`` if the settings may
+        have been changed elsewhere (e.g., from the front panel).
+
     """
 
     # TODO: Add power sweep ability
-    # TODO: Add frequency sweep
-    #     Start Continuous Sweep:
-    #     freq:star 1e9;stop 2e9;step 100e6;mode swe
-    #     swe:dwel 0.1
-    #     init:cont on
-    #     <let sweep run>
-    #     init:cont off
+
+    # Pre-encoded commands
+    _CMD_FREQ_Q = b'FREQ?'
+    _CMD_POW_Q = b'POW?'
+    _CMD_OUTP_ON = b'OUTP 1'
+    _CMD_OUTP_OFF = b'OUTP 0'
+    _CMD_OUTP_Q = b'OUTP:STAT?'
+    _CMD_FREQ_MODE_CW = b'FREQ:MODE CW'
+
+    # Command templates (bytes formatting avoids str.format and encoding)
+    _FMT_FREQ_GHZ = b'FREQ %.9f GHZ'
+    _FMT_POW_DBM = b'POW %s dBm'  # as str() prints it (full resolution)
+
+    def __init__(self, *args, **kwargs):
+
+        # Last values set on the instrument
+        self._cache = {}
+
+        super().__init__(*args, **kwargs)
+
+    def reset(self):
+        """Reset instrument."""
+
+        super().reset()
+        self._cache.clear()
+
+    def _invalidate_cache(self):
+        """Discard the cached frequency, power and output state."""
+
+        self._cache.clear()
 
     def set_frequency(self, freq, units='GHz'):
         """Set frequency.
@@ -52,26 +80,31 @@ class Hittite(GenericInstrument):
         """
 
         # Frequency in GHz
-        freq_ghz = freq * FREQ_UNIT_GHZ[units.lower()]
+        freq_ghz = freq * _ghz_units(units)
 
-        self._send(f'FREQ {freq_ghz:.9f} GHZ')
+        self._send(self._FMT_FREQ_GHZ % freq_ghz)
+        self._cache['freq_hz'] = freq_ghz * 1e9
 
         if self.verbose:
             print(f"Signal generator: set frequency to {freq:.3f} {units}")
 
-    def get_frequency(self, units='GHz'):
+    def get_frequency(self, units='GHz', refresh=False):
         """Get frequency of signal generator.
 
         Args:
             units (string, optional, default is 'GHz'): units for the returned
                 frequency value
+            refresh (bool, optional, default is False): query the instrument
+                even if the frequency is cached
 
         Returns:
             float: frequency of signal generator
 
         """
 
-        return float(self._query('FREQ?')) / _frequency_units(units)
+        if refresh or 'freq_hz' not in self._cache:
+            self._cache['freq_hz'] = float(self._query(self._CMD_FREQ_Q))
+        return self._cache['freq_hz'] / _frequency_units(units)
 
     def set_power(self, power, units='dBm'):
         """Set power.
@@ -85,25 +118,33 @@ class Hittite(GenericInstrument):
         power = float(power)
         assert units.lower() == 'dbm', "Only dBm supported."
         
-        self._send(f'POW {power} {units}')
+        self._send(self._FMT_POW_DBM % _encode(power))
+        self._cache['power_dbm'] = power
 
         if self.verbose:
             print(f"Signal generator: set power to {power:.3f} {units}")
 
-    def get_power(self):
+    def get_power(self, refresh=False):
         """Get power from signal generator.
 
+        Args:
+            refresh (bool, optional, default is False): query the instrument
+                even if the power is cached
+
         Returns:
             float: output power from signal generator
 
         """
 
-        return float(self._query('POW?'))
+        if refresh or 'power_dbm' not in self._cache:
+            self._cache['power_dbm'] = float(self._query(self._CMD_POW_Q))
+        return self._cache['power_dbm']
 
     def power_off(self):
         """Turn off output power."""
 
-        self._send('OUTP 0')
+        self._send(self._CMD_OUTP_OFF)
+        self._cache['output'] = 0
 
         if self.verbose:
             print("Signal generator: power off")
@@ -111,89 +152,285 @@ class Hittite(GenericInstrument):
     def power_on(self):
         """Turn on output power."""
 
-        self._send('OUTP 1')
+        self._send(self._CMD_OUTP_ON)
+        self._cache['output'] = 1
 
         if self.verbose:
             print("Signal generator: power on")
 
-    def get_output_state(self):
+    def get_output_state(self, refresh=False):
         """Get output on/off state from signal generator.
 
+        Args:
+            refresh (bool, optional, default is False): query the instrument
+                even if the output state is cached
+
         Returns:
             float: output state (0/1) from signal generator
 
         """
 
-        return int(self._query('OUTP:STAT?'))
+        if refresh or 'output' not in self._cache:
+            self._cache['output'] = self._query_int(self._CMD_OUTP_Q)
+        return self._cache['output']
+
+    def sweep(self, start, stop, step, dwell, units='GHz', continuous=False,
+              wait=True):
+        """Run a frequency sweep.
+
+        The signal generator steps through the frequencies itself, so the
+        whole sweep is set up and started with a single message. After a
+        single sweep that is waited for, the signal generator is returned
+        to fixed frequency (CW) mode; otherwise call ``sweep_stop`` once
+        the sweep is done.
+
+        Args:
+            start (float): start frequency
+            stop (float): stop frequency
+            step (float): frequency step
+            dwell (float): dwell time at each frequency in seconds
+            units (string, optional, default is 'GHz'): units for frequency
+            continuous (bool, optional, default is False): repeat the sweep
+                until ``sweep_stop`` is called
+            wait (bool, optional, default is True): wait for a single sweep
+                to finish before returning
+
+        """
+
+        mult = _ghz_units(units)
+        cmds = [f'FREQ:STAR {start * mult:.9f} GHZ',
+                f'FREQ:STOP {stop * mult:.9f} GHZ',
+                f'FREQ:STEP {step * mult:.9f} GHZ',
+                'FREQ:MODE SWE',
+                f'SWE:DWEL {dwell}']
+        if continuous:
+            cmds.append('INIT:CONT ON')
+        else:
+            cmds += ['INIT:CONT OFF', 'INIT']
+        wait = wait and not continuous
+        if wait:
+            cmds.append('*OPC?')
+
+        # Frequency is no longer fixed
+        self._cache.pop('freq_hz', None)
+
+        self._send_batch(*cmds)
+        if wait:
+            if self._timeout is None:
+                timeout = None
+            else:
+                sweep_time = _sweep_points(start, stop, step) * dwell
+                timeout = sweep_time + self._timeout
+            with self._temporary_timeout(timeout):
+                self._receive()
+            self._send(self._CMD_FREQ_MODE_CW)
+
+        if self.verbose:
+            print(f"Signal generator: sweep {start} to {stop} {units}")
+
+    def sweep_stop(self):
+        """Stop a sweep and return to fixed frequency mode.
+
+        Needed after a continuous sweep, or a sweep started with
+        ``wait=False``.
+
+        """
+
+        self._send_batch('INIT:CONT OFF', self._CMD_FREQ_MODE_CW)
+
+    def synchronized_fetch(self, dmm, start, stop, step, dwell, units='GHz',
+                           voltage_units='V'):
+        """Run a single frequency sweep and read a multimeter at each step.
+
+        The multimeter is armed to take one reading per external trigger, so
+        the signal generator's trigger output must be connected to the
+        multimeter's external trigger input.
+
+        Args:
+            dmm (Agilent34411A): multimeter
+            start (float): start frequency
+            stop (float): stop frequency
+            step (float): frequency step
+            dwell (float): dwell time at each frequency in seconds
+            units (string, optional, default is 'GHz'): units for frequency
+            voltage_units (string, optional, default is 'V'): units for the
+                multimeter readings
+
+        Returns:
+            numpy.ndarray: one reading for each frequency in the sweep
+
+        """
+
+        dmm.arm(_sweep_points(start, stop, step), source="EXT")
+        self.sweep(start, stop, step, dwell, units=units, wait=True)
+        return dmm.fetch_readings(voltage_units)
+
+    def configure(self, freq=None, power=None, output=None, freq_units='GHz',
+                  power_units='dBm', wait=False):
+        """Set frequency, power and/or output state in a single write.
+
+        This is faster than calling ``set_frequency``, ``set_power`` and
+        ``power_on``/``power_off`` separately, since all of the commands are
+        sent to the instrument in one message.
+
+        Args:
+            freq (float, optional): frequency to set
+            power (float, optional): power to set
+            output (bool, optional): turn output power on (True) or off
+                (False)
+            freq_units (string, optional, default is 'GHz'): units for
+                frequency
+            power_units (string, optional, default is 'dBm'): units for power
+            wait (bool, optional, default is False): wait until the
+                instrument has applied the settings (``*OPC?`` is appended
+                to the same message)
+
+        """
+
+        cmds, cache = [], {}
+        if freq is not None:
+            freq_ghz = freq * _ghz_units(freq_units)
+            cmds.append(self._FMT_FREQ_GHZ % freq_ghz)
+            cache['freq_hz'] = freq_ghz * 1e9
+        if power is not None:
+            power = float(power)
+            assert power_units.lower() == 'dbm', "Only dBm supported."
+            cmds.append(self._FMT_POW_DBM % _encode(power))
+            cache['power_dbm'] = power
+        if output is not None:
+            cmds.append(self._CMD_OUTP_ON if output else self._CMD_OUTP_OFF)
+            cache['output'] = int(bool(output))
+        if not cmds:
+            return
+
+        if wait:
+            self._send_batch(*cmds, b'*OPC?')
+            self._receive()
+        else:
+            self._send_batch(*cmds)
+        self._cache.update(cache)
+
+        if self.verbose:
+            print(f"Signal generator: {b'; '.join(cmds).decode('ASCII')}")
+
 
 class SignalGenerator(Hittite):
     """For backwards compatibility with Bob's code...
     
-    Bob uses camelCase for all of his method names (see below).
+    Bob uses camelCase for all of his method names (see below). These are
+    aliases of the ``Hittite`` methods (default units are GHz and dBm).
 
     """
 
-    def setFreq(self, freq):
-        """Set frequency in GHz.
+    setFreq = Hittite.set_frequency
+    getFreq = Hittite.get_frequency
+    setPower = Hittite.set_power
+    getPower = Hittite.get_power
+    powerOff = Hittite.power_off
+    powerOn = Hittite.power_on
+
+
+class AsyncHittite(AsyncGenericInstrument):
+    """Control a Hittite signal generator using asyncio.
+
+    Mirrors the ``Hittite`` API, but every method is a coroutine. Use
+    ``connect`` to create an instance::
+
+        sg = await AsyncHittite.connect('192.168.0.159')
+        await sg.set_frequency(5, 'GHz')
+
+    """
+
+    async def set_frequency(self, freq, units='GHz'):
+        """Set frequency.
 
         Args:
-            freq (float): frequency in GHz
+            freq (float): Frequency to set
+            units (string, optional, default is 'GHz'): units for frequency
 
         """
 
-        self.set_frequency(freq, units='GHz')
+        freq_ghz = freq * _ghz_units(units)
+        await self._send(Hittite._FMT_FREQ_GHZ % freq_ghz)
 
-    def getFreq(self):
-        """Get frequency in GHz.
+    async def get_frequency(self, units='GHz'):
+        """Get frequency of signal generator.
+
+        Args:
+            units (string, optional, default is 'GHz'): units for the returned
+                frequency value
 
         Returns:
-            float: frequency in GHz
+            float: frequency of signal generator
 
         """
 
-        return self.get_frequency(units='GHz')
+        msg = Hittite._CMD_FREQ_Q
+        return float(await self._query(msg)) / _frequency_units(units)
 
-    def setPower(self, power):
-        """Set power in dBm.
+    async def set_power(self, power, units='dBm'):
+        """Set power.
 
         Args:
-            power (float): power in dBm
+            power (float): Power to set
+            units (string, optional, default is 'dBm'): units for power
 
         """
 
-        self.set_power(power, units='dBm')
+        power = float(power)
+        assert units.lower() == 'dbm', "Only dBm supported."
+        await self._send(Hittite._FMT_POW_DBM % _encode(power))
 
-    def getPower(self):
-        """Get power in dBm.
+    async def get_power(self):
+        """Get power from signal generator.
 
         Returns:
-            float: power in dBm
+            float: output power from signal generator
 
         """
 
-        return self.get_power()
+        return float(await self._query(Hittite._CMD_POW_Q))
 
-    def powerOff(self):
+    async def power_off(self):
         """Turn off output power."""
 
-        self.power_off()
+        await self._send(Hittite._CMD_OUTP_OFF)
 
-    def powerOn(self):
+    async def power_on(self):
         """Turn on output power."""
 
-        self.power_on()
+        await self._send(Hittite._CMD_OUTP_ON)
+
+    async def get_output_state(self):
+        """Get output on/off state from signal generator.
+
+        Returns:
+            float: output state (0/1) from signal generator
+
+        """
+
+        return int(await self._query(Hittite._CMD_OUTP_Q))
 
 
 # Helper functions -----------------------------------------------------------
 
+@lru_cache(maxsize=8)
 def _frequency_units(units):
     """Get frequency multiplier."""
-    freq_units = {'ghz': 1e9, 'mhz': 1e6, 'khz': 1e3, 'hz': 1}
-    try:
-        return freq_units[units.lower()]
-    except KeyError as e:
-        print('Error: Frequency units must be one of: GHz, MHz, kHz or Hz')
-        raise e
+    return _FREQ_UNITS[units.lower()]
+
+@lru_cache(maxsize=8)
+def _ghz_units(units):
+    """Get multiplier to convert frequency to GHz."""
+    return FREQ_UNIT_GHZ[units.lower()]
+
+def _encode(value):
+    """Encode a value for a command template."""
+    return str(value).encode('ASCII')
+
+def _sweep_points(start, stop, step):
+    """Get number of points in a frequency sweep."""
+    return int(round((stop - start) / step)) + 1
 
 
 # Main -----------------------------------------------------------------------
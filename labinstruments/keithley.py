@@ -11,6 +11,9 @@ import pyvisa as visa
 
 from labinstruments.generic import GenericInstrumentVX11
 
+# VISA resource manager (shared by all instruments)
+_RM = None
+
 
 class Keithley2280(GenericInstrumentVX11):
     """Control a Keithley 2280 power supply.
@@ -21,6 +24,12 @@ class Keithley2280(GenericInstrumentVX11):
 
     """
 
+    # Command templates (bytes formatting avoids str.format and encoding)
+    _FMT_VOLT = b':VOLT %.3f'
+    _FMT_VOLT_LIM = b':VOLT:LIM %.3f'
+    _FMT_CURR = b':CURR %.3f'
+    _FMT_CURR_LIM = b':CURR:LIM %.3f'
+
     def __init__(self, ip_address):
 
         super(self.__class__, self).__init__(ip_address)
@@ -29,28 +38,44 @@ class Keithley2280(GenericInstrumentVX11):
         output = self._inst.ask(':OUTP?')
         self.output = output == '1'
 
-    def set_voltage(self, voltage):
+        # Only return the reading (this setting persists, so it is only
+        # sent once)
+        self._inst.write(":FORM:ELEM \"READ\"")
+
+    def reset(self):
+        """Reset instrument."""
+
+        super().reset()
+
+        # *RST restores the default data elements
+        self._inst.write(":FORM:ELEM \"READ\"")
+
+    def set_voltage(self, voltage, verify=False):
         """Set voltage.
 
         Args:
             voltage (float): voltage in units 'V'
+            verify (bool, optional, default is False): read back the
+                voltage if the output is on
 
         """
 
-        self._inst.write(f':VOLT {voltage:.3f}')
-        if self.output:
+        self._send(self._FMT_VOLT % voltage)
+        if verify and self.output:
             _ = self.get_voltage()
 
-    def set_voltage_limit(self, voltage):
+    def set_voltage_limit(self, voltage, verify=False):
         """Set voltage limit.
 
         Args:
             voltage (float): voltage limit in units 'V'
+            verify (bool, optional, default is False): read back the
+                voltage if the output is on
 
         """
 
-        self._inst.write(f':VOLT:LIM {voltage:.3f}')
-        if self.output:
+        self._send(self._FMT_VOLT_LIM % voltage)
+        if verify and self.output:
             _ = self.get_voltage()
 
     def get_voltage(self):
@@ -61,31 +86,34 @@ class Keithley2280(GenericInstrumentVX11):
 
         """
 
-        self._inst.write(":FORM:ELEM \"READ\"")
         return self._inst.ask(':MEAS:VOLT?')
 
-    def set_current(self, current):
+    def set_current(self, current, verify=False):
         """Set current.
 
         Args:
             current (float): current in units 'A'
+            verify (bool, optional, default is False): read back the
+                current if the output is on
 
         """
 
-        self._inst.write(f':CURR {current:.3f}')
-        if self.output:
+        self._send(self._FMT_CURR % current)
+        if verify and self.output:
             _ = self.get_current()
 
-    def set_current_limit(self, current):
+    def set_current_limit(self, current, verify=False):
         """Set current limit.
 
         Args:
             current (float): current limit in units 'A'
+            verify (bool, optional, default is False): read back the
+                current if the output is on
 
         """
 
-        self._inst.write(f':CURR:LIM {current:.3f}')
-        if self.output:
+        self._send(self._FMT_CURR_LIM % current)
+        if verify and self.output:
             _ = self.get_current()
 
     def get_current(self):
@@ -96,7 +124,6 @@ class Keithley2280(GenericInstrumentVX11):
 
         """
 
-        self._inst.write(":FORM:ELEM \"READ\"")
         return self._inst.ask(':MEAS:CURR?')
 
     def power_on(self):
@@ -128,33 +155,63 @@ class Keithley2602:
     Args:
         ip_address (string): IP address of the power supply, e.g.,
             "192.168.0.117"
+        timeout (float, optional, default is 2): timeout in seconds, or None
+            to block indefinitely
 
     """
 
-    def __init__(self, ip_address):
+    def __init__(self, ip_address, timeout=2.0):
 
-        rm = visa.ResourceManager()
         address = f"TCPIP0::{ip_address}::inst0::INSTR"
-        self._inst = rm.open_resource(address)
+        self._inst = _get_rm().open_resource(address)
+        # pyvisa timeout is in ms (None means no timeout)
+        self._inst.timeout = None if timeout is None else timeout * 1000
+        self._inst.read_termination = '\n'
+        self._inst.write_termination = '\n'
+
+        # Identity string (queried on first call to get_id)
+        self._id = None
 
         # Measurement speed
         self._write("smua.measure.nplc = 0.5")
         self._write("smub.measure.nplc = 0.5")
 
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+    def close(self):
+        """Close connection to instrument."""
+
+        self._inst.close()
+
     def _write(self, command):
 
         self._inst.write(command)
 
     def _query(self, command):
 
-        self._write("x = " + command)
-        result = self._inst.query("print(x)")
-        return float(result)
+        return float(self._inst.query(f"print({command})"))
 
-    def get_id(self):
-        """Get identity of signal generator."""
+    def get_id(self, force=False):
+        """Get identity of signal generator.
 
-        return self._inst.query("print([[Keithley Instruments Inc., Model]]..localnode.model..[[, ]]..localnode.serialno..[[, ]]..localnode.revision)").replace(', ', ' ').strip()
+        Args:
+            force (bool, optional, default is False): query the instrument,
+                instead of returning the cached identity
+
+        Returns:
+            str: identity string
+
+        """
+
+        if force or self._id is None:
+            self._id = self._inst.query("print([[Keithley Instruments Inc., Model]]..localnode.model..[[, ]]..localnode.serialno..[[, ]]..localnode.revision)").replace(', ', ' ').strip()
+        return self._id
 
     def reset(self):
         """Reset instrument."""
@@ -253,6 +310,25 @@ class Keithley2602:
 
         return self._query("smub.source.leveli")
 
+    def read_all(self):
+        """Measure current and voltage on both channels.
+
+        All four values are measured and returned in a single query.
+
+        Returns:
+            tuple: current (A) and voltage (V) on channel A, then current (A)
+                and voltage (V) on channel B
+
+        """
+
+        # Only the last function call in an argument list expands to all of
+        # its return values, so assign them to locals first
+        msg = ("local ia, va = smua.measure.iv() "
+               "local ib, vb = smub.measure.iv() "
+               "print(ia, va, ib, vb)")
+        ia, va, ib, vb = [float(x) for x in self._inst.query(msg).split()]
+        return ia, va, ib, vb
+
     def output1_off(self):
         """Turn off output power (channel A)."""
 
@@ -274,6 +350,16 @@ class Keithley2602:
         self._inst.write("smub.source.output = smub.OUTPUT_ON")
 
 
+# Helper functions -----------------------------------------------------------
+
+def _get_rm():
+    """Get VISA resource manager (created on first use)."""
+    global _RM
+    if _RM is None:
+        _RM = visa.ResourceManager()
+    return _RM
+
+
 # Main -----------------------------------------------------------------------
 
 if __name__ == "__main__":
@@ -25,56 +25,90 @@ class YigFilter(GenericInstrumentTelnet):
     Args:
         ip_address (string): IP address of the Yig filter, e.g.,
             ``ip_address='192.168.0.159'``
+        units (string, optional, default is 'GHz'): default units for
+            frequency (see ``set_units``)
 
     """
 
-    def __init__(self, ip_address):
+    # Command template (frequency in MHz)
+    _FMT_FREQ = "F%.3f"
 
-        super(self.__class__, self).__init__(ip_address)
+    def __init__(self, ip_address, units='GHz'):
 
-        self._freq_string = "F{:.3f}"
+        super().__init__(ip_address)
 
-        # Read start up lines
-        msg1 = self._tn.read_some()
-        msg2 = self._tn.read_some()
-        msg3 = self._tn.read_some()
-        msg4 = self._tn.read_some()
+        # Multiplier to convert from the default units to MHz
+        self.set_units(units)
 
-    def get_id(self):
+        # Identity string (queried on first call to get_id)
+        self._id = None
 
-        fmin_ghz = float(self._query("R0003")) / 1000
-        fmax_ghz = float(self._query("R0004")) / 1000
+        # Read start up lines (wait for the prompt, but not for longer than
+        # 0.5 s)
+        self._drain(0.5)
 
-        return "Micro Lambda Wireless Inc. " + \
-               self._query("R0000") + " " + \
-               self._query("R0001") + " " + \
-               self._query("R0002") + \
-               f" ({fmin_ghz:.0f} to {fmax_ghz:.0f} GHz)"
+    def get_id(self, force=False):
+        """Get instrument identity.
 
-    def set_frequency(self, freq, units='GHz'):
+        The model, serial number and frequency range do not change, so they
+        are only queried from the instrument once.
+
+        Args:
+            force (bool, optional, default is False): query the instrument,
+                instead of returning the cached identity
+
+        Returns:
+            str: identity string
+
+        """
+
+        if self._id is not None and not force:
+            return self._id
+
+        # Send all queries at once (one round trip)
+        resp = self._query_many(["R0000", "R0001", "R0002", "R0003", "R0004"])
+        fmin_ghz = float(resp[3]) / 1000
+        fmax_ghz = float(resp[4]) / 1000
+
+        self._id = "Micro Lambda Wireless Inc. " + \
+                   " ".join(resp[:3]) + \
+                   f" ({fmin_ghz:.0f} to {fmax_ghz:.0f} GHz)"
+        return self._id
+
+    def set_units(self, units):
+        """Set the default units for frequency.
+
+        Args:
+            units (string): units for frequency, e.g., 'GHz'
+
+        """
+
+        self._mult = FREQ_UNIT[units.lower()]
+
+    def set_frequency(self, freq, units=None):
         """Set frequency.
 
         Args:
             freq (float): Frequency to set
-            units (string, optional, default is 'GHz'): units for frequency
+            units (string, optional): units for frequency, default is the
+                units set with ``set_units`` ('GHz' unless changed)
 
         """
 
         # Frequency in MHz
-        freq = freq * FREQ_UNIT[units.lower()]
+        if units is None:
+            freq = freq * self._mult
+        else:
+            freq = freq * FREQ_UNIT[units.lower()]
 
         # Message to instrument
-        msg = self._freq_string.format(float(freq))
+        msg = self._FMT_FREQ % freq
         self._write(msg)
 
 
 class YigSynthesizer(YigFilter):
 
-    def __init__(self, ip_address):
-
-        super(self.__class__, self).__init__(ip_address)
-
-        self._freq_string = "F{:.6f}"
+    _FMT_FREQ = "F%.6f"
 
 
 if __name__ == "__main__":
@@ -11,11 +11,15 @@ SCPI documentation:
 """
 
 import time
+from functools import lru_cache
 
 import numpy as np
 
 from labinstruments.generic import GenericInstrument
 
+# Frequency units, as sent to the instrument
+_FREQ_UNITS = {'ghz': b'GHZ', 'mhz': b'MHZ', 'khz': b'KHZ', 'hz': b'HZ'}
+
 
 class RohdeSchwarzFSVA40(GenericInstrument):
     """Class to control a Rohde & Schwarz FSVA-40 spectrum analyzer.
@@ -23,38 +27,73 @@ class RohdeSchwarzFSVA40(GenericInstrument):
     Args:
         ip_address (string): IP address, e.g., ``ip_address='192.168.0.3'``
         port (int, optional, default is 5025): the port set for Ethernet communication
+        rcvbuf (int, optional, default is 1 MB): size of the kernel receive
+            buffer, large enough to hold a whole trace
+
+    Note:
+
+        On Linux, the receive buffer size is capped by ``net.core.rmem_max``.
+        Increase it (e.g., ``sysctl -w net.core.rmem_max=1048576``) to get
+        the full buffer.
 
     """
 
+    # Read traces in large chunks
+    _RECV_SIZE = 262144
+
+    # Command templates (bytes formatting avoids str.format and encoding)
+    _FMT_FREQ_VALUE = b'%s %.6f %s'
+    _FMT_MARK_X = b'CALC:MARK%d:X %.6f%s'
+
+    def __init__(self, ip_address, port=5025, rcvbuf=1048576, **kwargs):
+
+        # Frequency axis of the trace (calculated when it is first needed)
+        self._freq_axis = None
+
+        super().__init__(ip_address, port, rcvbuf=rcvbuf, **kwargs)
+
+    def reset(self):
+        """Reset instrument."""
+
+        super().reset()
+        self._freq_axis = None
+
+    def _invalidate_cache(self):
+        """Discard the cached frequency axis."""
+
+        self._freq_axis = None
+
     # Settings ---------------------------------------------------------------
 
     def _set_frequency_value(self, command, f, units):
 
-        self._send(f"{command} {f:.6f} {units.upper()}")
+        units = _frequency_units(units)
+        self._send(self._FMT_FREQ_VALUE % (command, f, units))
+        self._freq_axis = None
 
     def set_min_frequency(self, f, units='ghz'):
 
-        self._set_frequency_value("FREQ:STAR", f, units)
+        self._set_frequency_value(b'FREQ:STAR', f, units)
 
     def set_max_frequency(self, f, units='ghz'):
 
-        self._set_frequency_value("FREQ:STOP", f, units)
+        self._set_frequency_value(b'FREQ:STOP', f, units)
 
     def set_center_frequency(self, f, units='ghz'):
 
-        self._set_frequency_value("FREQ:CENT", f, units)
+        self._set_frequency_value(b'FREQ:CENT', f, units)
 
     def set_span(self, f, units='ghz'):
 
-        self._set_frequency_value("FREQ:SPAN", f, units)
+        self._set_frequency_value(b'FREQ:SPAN', f, units)
 
     def set_rbw(self, f, units='mhz'):
 
-        self._set_frequency_value("BAND:RES", f, units)
+        self._set_frequency_value(b'BAND:RES', f, units)
 
     def set_vbw(self, f, units='mhz'):
 
-        self._set_frequency_value("BAND:VID", f, units)
+        self._set_frequency_value(b'BAND:VID', f, units)
 
     def set_vbw_auto(self, state="ON"):
 
@@ -73,48 +112,57 @@ class RohdeSchwarzFSVA40(GenericInstrument):
         if isinstance(level, float) or isinstance(level, int):
             self._send(f"DISP:TRAC:Y:RLEV {level:.0f}{units}")
         elif level.lower() == "auto":
-            self._send("ADJ:LEV")
+            self._send(b"ADJ:LEV")
 
     def set_attenuation(self, attenuation):
 
         if isinstance(attenuation, float) or isinstance(attenuation, int):
             self._send(f"INP:ATT {attenuation:.0f}dB")
         elif attenuation.lower() == "auto":
-            self._send("INP:ATT:AUTO ON")
+            self._send(b"INP:ATT:AUTO ON")
 
     # Sweep ------------------------------------------------------------------
 
     def single_sweep(self):
 
-        self._send("SWE:CONT OFF")
-        self._send("INIT")
+        self._send(b"SWE:CONT OFF")
+        self._send(b"INIT")
 
     def continuous_sweep(self):
 
-        self._send("SWE:CONT ON")
-        self._send("INIT")
+        self._send(b"SWE:CONT ON")
+        self._send(b"INIT")
 
-    def sweep(self, count=1, wait=True, verbose=False):
+    def sweep(self, count=1, wait=True, verbose=False, timeout=None):
 
-        self._send(f"SWE:COUN {count:d}")
-        self._send("SWE:CONT OFF")
-        self._send("SYST:DISP:UPD ON")
-        self._send("INIT")
+        self._send_batch(f"SWE:COUN {count:d}", "SWE:CONT OFF",
+                         "SYST:DISP:UPD ON", "INIT")
         if wait:
-            return self.wait(count=count, verbose=verbose)
-        else:
-            pass
+            return self.wait(count=count, verbose=verbose, timeout=timeout)
+
+    def wait(self, count=1, verbose=False, timeout=None):
+        """Wait for the sweep(s) to finish.
 
-    def wait(self, count=1, verbose=False):
+        Instead of polling the sweep count, this sends a single ``*OPC?``
+        query, which the analyzer only answers once all of the sweeps are
+        done.
+
+        Args:
+            count (int): number of sweeps (only used for the return value)
+            verbose (bool): print the sweep time
+            timeout (float, optional): maximum time to wait in seconds,
+                default is to wait indefinitely
+
+        Returns:
+            int: number of sweeps
+
+        """
 
         if verbose:
             print("\t\tWaiting for sweep...")
         start_time = time.time()
-        time.sleep(0.1)
-        current_count = 0
-        while current_count < count:
-            current_count = self.get_count()
-            time.sleep(0.01)
+        with self._temporary_timeout(timeout):
+            self._query("*OPC?")
         total_time = time.time() - start_time
         if verbose:
             print(f"\t\t-> sweep time: {total_time:.2f} s")
@@ -123,13 +171,14 @@ class RohdeSchwarzFSVA40(GenericInstrument):
     def set_sweep_points(self, n_pts):
 
         self._send(f"SWE:POIN {n_pts}")
+        self._freq_axis = None
 
     def set_sweep_time(self, sweep_time):
 
         if isinstance(sweep_time, str) and sweep_time.lower() == 'auto':
-            self._send(f"SWE:TIME:AUTO ON")
+            self._send(b"SWE:TIME:AUTO ON")
         else:
-            self._send(f"SWE:TIME:AUTO OFF")
+            self._send(b"SWE:TIME:AUTO OFF")
             self._send(f"SWE:TIME {sweep_time:.3f}s")
 
     def set_sweep_type(self, sweep_type="auto"):
@@ -138,7 +187,7 @@ class RohdeSchwarzFSVA40(GenericInstrument):
 
     def get_count(self):
 
-        return int(self._query("SWE:COUN:CURR?"))
+        return self._query_int(b"SWE:COUN:CURR?")
 
     # Averaging --------------------------------------------------------------
 
@@ -162,7 +211,8 @@ class RohdeSchwarzFSVA40(GenericInstrument):
 
     def set_marker_frequency(self, freq, units="GHz", n_marker=1):
 
-        self._send(f"CALC:MARK{n_marker:d}:X {freq:.6f}{units}")
+        units = _frequency_units(units)
+        self._send(self._FMT_MARK_X % (n_marker, freq, units))
 
     def get_marker_value(self, n_marker=1):
 
@@ -174,12 +224,39 @@ class RohdeSchwarzFSVA40(GenericInstrument):
 
     # Trace ------------------------------------------------------------------
 
+    def get_frequency_axis(self):
+        """Get the frequency of each point in the trace.
+
+        The sweep points are evenly spaced between the start and stop
+        frequencies, so the axis is calculated from these instead of being
+        transferred from the analyzer. It is cached until the frequency
+        range or the number of sweep points is changed. (Not valid for zero
+        span measurements.)
+
+        Returns:
+            numpy.ndarray: frequencies in Hz
+
+        """
+
+        if self._freq_axis is None:
+            self._send_batch("FREQ:STAR?", "FREQ:STOP?", "SWE:POIN?")
+            fstart, fstop, npts = self._receive().split(';')
+            self._freq_axis = np.linspace(float(fstart), float(fstop),
+                                          int(npts))
+            # Shared between calls, so don't allow it to be modified
+            self._freq_axis.flags.writeable = False
+        return self._freq_axis
+
     def get_trace(self):
 
-        self._send("TRAC:DATA:X? TRACE1")
-        x = np.array([float(val) for val in self._receive_all().split(',')])
-        self._send("TRAC:DATA? TRACE1")
-        y = np.array([float(val) for val in self._receive_all().split(',')])
+        # Copy of the cached axis, so that the caller can modify it
+        x = self.get_frequency_axis().copy()
+
+        # Trace data as a binary block of little-endian 32-bit floats
+        self._send_batch("FORM REAL,32", "FORM:BORD SWAP", "TRAC:DATA? TRACE1")
+        data = self._receive_block()
+        self._send(b"FORM ASC")
+        y = np.frombuffer(data, dtype='<f4').astype(np.float64)
         
         return x, y
 
@@ -188,11 +265,13 @@ class RohdeSchwarzFSVA40(GenericInstrument):
     def set_external_mixer_state(self, state="ON"):
 
         self._send(f"MIX {state.upper()}")
+        self._freq_axis = None
 
     def set_external_mixer_band(self, band="F"):
 
         self.set_external_mixer_state("ON")
         self._send(f"MIX:HARM:BAND {band.upper()}")
+        self._freq_axis = None
 
     def set_external_mixer_signal_detection(self, state="AUTO"):
 
@@ -200,6 +279,16 @@ class RohdeSchwarzFSVA40(GenericInstrument):
         self._send(f"MIX:SIGN {state.upper()}")
 
 
+# Helper functions -----------------------------------------------------------
+
+@lru_cache(maxsize=8)
+def _frequency_units(units):
+    """Get frequency units as sent to the instrument."""
+    return _FREQ_UNITS[units.lower()]
+
+
+# Main -----------------------------------------------------------------------
+
 if __name__ == "__main__":
 
     import matplotlib.pyplot as plt
@@ -220,18 +309,21 @@ if __name__ == "__main__":
     speca = RohdeSchwarzFSVA40("192.168.1.40")
     print("\n" + speca.get_id())
 
-    # Frequency range
-    speca.set_center_frequency(fcenter_ghz, 'ghz')
-    speca.set_span(fspan_mhz, 'mhz')
-    speca.set_sweep_points(sweep_npts)
-
-    # Resolution / video bandwidth
-    speca.set_rbw_auto("off")
-    speca.set_rbw(rbw_khz, 'khz')
-    speca.set_vbw_auto("off")
-    speca.set_vbw(vbw_khz, 'khz')
-    speca.set_sweep_time("auto")
-    speca.set_sweep_type("fft")
+    # Send all of the settings in one write
+    with speca.batch():
+
+        # Frequency range
+        speca.set_center_frequency(fcenter_ghz, 'ghz')
+        speca.set_span(fspan_mhz, 'mhz')
+        speca.set_sweep_points(sweep_npts)
+
+        # Resolution / video bandwidth
+        speca.set_rbw_auto("off")
+        speca.set_rbw(rbw_khz, 'khz')
+        speca.set_vbw_auto("off")
+        speca.set_vbw(vbw_khz, 'khz')
+        speca.set_sweep_time("auto")
+        speca.set_sweep_type("fft")
 
     # Averaging
     speca.averaging(averaging)
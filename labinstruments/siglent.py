@@ -10,11 +10,6 @@ Siglent SCPI instructions:
 
 """
 
-import os
-import socket
-import sys
-import time
-
 from labinstruments.generic import GenericInstrument
 
 
@@ -45,19 +40,19 @@ class SiglentSDS1104XE(GenericInstrument):
 
         """
 
-        # Set mode
-        msg = 'PACU RMS,C{}'
-        self._send(msg.format(channel))
-
-        time.sleep(0.2)
+        # Set mode (and wait until it has been applied)
+        self._send(f'PACU RMS,C{channel}')
+        self._query('*OPC?')
 
-        # Read RMS voltage
+        # Read RMS voltage (send all of the queries at once, then read all
+        # of the responses)
+        msg = f"C{channel}:PAVA? RMS".encode('ASCII')
+        self._send(b'\n'.join([msg] * average))
         rms_voltage = 0
-        msg = "C{}:PAVA? RMS"
         for _ in range(average):
-            self._send(msg.format(channel))
+            # e.g., "C1:PAVA RMS,1.23E-03V"
             value = self._receive()
-            rms_voltage += float(value.split(',')[-1][:-1])
+            rms_voltage += float(value[value.rindex(',') + 1:-1])
 
         return rms_voltage / average
 